@@ -21,6 +21,16 @@ import shutil
 import platform
 import re
 import argparse
+import glob
+import threading
+import hashlib
+import time
+import ssl
+import tarfile
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 class Colors:
     HEADER = '\033[95m'
@@ -31,50 +41,103 @@ class Colors:
     BOLD = '\033[1m'
     RESET = '\033[0m'
 
+# Plain output when not writing to a terminal (e.g. CI logs)
+if not sys.stdout.isatty():
+    for _name in ('HEADER', 'OK', 'INFO', 'WARN', 'FAIL', 'BOLD', 'RESET'):
+        setattr(Colors, _name, '')
+
 # Configuration
 REPO_URL = "https://github.com/devttys0/sasquatch.git"
 SQUASHFS_URL = "https://downloads.sourceforge.net/project/squashfs/squashfs/squashfs4.3/squashfs4.3.tar.gz"
+DOWNLOAD_TIMEOUT = 60  # Seconds without data before a stalled download is aborted
+SQUASHFS_SHA256 = "0d605512437b1eb800b4736791559295ee5f60177e102e4d4ccd0ee241a5f3f6"
+# Written only after the tarball's checksum matched and the tree was moved into place
+SQUASHFS_MARKER = "squashfs4.3/.sasquatch_verified"
+PATCHED_MARKER = ".sasquatch_patched"
+BUILD_CONFIG_STAMP = ".sasquatch_build_config"  # Lives in squashfs-tools
+PATCH_FILE = "repo/patches/patch0.txt"  # The only file the builder needs from the repo
 BUILD_DIR = "sasquatch_rc1_build"
+GIT_JOBS = str(os.cpu_count() or 2)
+# Parallel submodule/remote fetches for every git invocation (no global config change)
+GIT_PARALLEL_OPTS = ["-c", f"submodule.fetchJobs={GIT_JOBS}", "-c", "fetch.parallel=0"]
+# Only the current patches/ tree is needed: skip history and lazily fetch blobs
+GIT_CLONE_OPTS = [f"--jobs={GIT_JOBS}", "--depth=1", "--single-branch", "--filter=blob:none", "--sparse"]
 VERBOSE = False  # Global flag for verbose output
+CLEAN_BUILD = False  # Global flag: discard BUILD_DIR instead of reusing it
+PORTABLE = False  # Global flag: build without host-specific optimizations
+LTO_LDFLAGS = "LDFLAGS += -flto"
+# Optional persistent package cache (e.g. a directory restored by CI)
+PKG_CACHE_DIR = os.environ.get("SASQUATCH_PKG_CACHE_DIR")
+APT_LISTS_DIR = "/var/lib/apt/lists"
+APT_UPDATE_MAX_AGE = 6 * 3600  # Skip 'apt-get update' if lists are newer (seconds)
+MAKE_JOBS = os.environ.get("SASQUATCH_JOBS")  # Optional override for make -j/-l
+CCACHE_DIR = os.path.expanduser("~/.cache/sasquatch-ccache")
+
+# Source fixer patterns, compiled once at import
+_VERBOSE_DECL_RE = re.compile(rb'^\s*int\s+verbose\s*(=\s*0)?\s*;', re.MULTILINE)
+_SIGWINCH_HANDLER_RE = re.compile(rb'void\s+sigwinch_handler\s*\(\s*\)')
+_SIGALRM_HANDLER_RE = re.compile(rb'void\s+sigalrm_handler\s*\(\s*\)')
+_FIRST_SYS_INCLUDE_RE = re.compile(rb'(#include <.*>\n)')
+_INCLUDE_LINE_RE = re.compile(rb'^[ \t]*#include[^\n]*\n?', re.MULTILINE)
 
 def log(msg, color=Colors.INFO):
-    print(f"{color}[*] {msg}{Colors.RESET}")
+    """Log a status line; output is buffered and flushed at phase boundaries"""
+    sys.stdout.write(f"{color}[*] {msg}{Colors.RESET}\n")
 
 def vlog(msg, color=Colors.INFO):
     """Verbose log - only prints if VERBOSE flag is set"""
     global VERBOSE
     if VERBOSE:
-        print(f"{color}[V] {msg}{Colors.RESET}")
+        sys.stdout.write(f"{color}[V] {msg}{Colors.RESET}\n")
 
 def banner():
-    print(f"{Colors.HEADER}{Colors.BOLD}")
-    print("=" * 60)
-    print("      SASQUATCH UNIVERSAL BUILDER - RC 2")
-    print("=" * 60)
-    print("      Developer: M-Tarantino")
-    print("      Original Logic: Craig Heffner (devttys0)")
-    print("      License: GNU GPLv2")
-    print("=" * 60)
-    print(f"{Colors.RESET}")
-
-def run_cmd(cmd, check=True, silent=False):
-    """Execute shell command with optional output suppression"""
+    sys.stdout.write(
+        f"{Colors.HEADER}{Colors.BOLD}\n"
+        + "=" * 60 + "\n"
+        + "      SASQUATCH UNIVERSAL BUILDER - RC 2\n"
+        + "=" * 60 + "\n"
+        + "      Developer: M-Tarantino\n"
+        + "      Original Logic: Craig Heffner (devttys0)\n"
+        + "      License: GNU GPLv2\n"
+        + "=" * 60 + "\n"
+        + f"{Colors.RESET}\n"
+    )
+
+def run_cmd(cmd, check=True, silent=False, env=None):
+    """Execute a command with optional output suppression
+
+    cmd is preferably an argv list, which is executed directly; a string is
+    still run through the shell. Captured output is left as bytes; decode it
+    only where it is actually used.
+    """
+    # Keep buffered log lines ahead of the child's output
+    sys.stdout.flush()
     try:
         result = subprocess.run(
             cmd, 
-            shell=True, 
+            shell=isinstance(cmd, str), 
             check=check, 
             capture_output=silent, 
-            text=True
+            env=env
         )
         return result
     except subprocess.CalledProcessError as e:
         if not silent:
-            log(f"Command failed: {cmd}", Colors.FAIL)
+            log(f"Command failed: {format_cmd(cmd)}", Colors.FAIL)
             if hasattr(e, 'stderr') and e.stderr:
-                print(e.stderr)
+                sys.stderr.buffer.write(e.stderr)
+                sys.stderr.flush()
+        return None
+    except OSError as e:
+        # Without a shell, a missing binary raises instead of exiting 127
+        if not silent:
+            log(f"Command failed: {format_cmd(cmd)} ({e})", Colors.FAIL)
         return None
 
+def format_cmd(cmd):
+    """Render a command for log messages"""
+    return cmd if isinstance(cmd, str) else ' '.join(cmd)
+
 def detect_env():
     """Detects the environment and sets paths and package managers"""
     info = {
@@ -90,31 +153,66 @@ def detect_env():
         info['is_termux'] = True
         info['prefix'] = os.environ.get('PREFIX', '/data/data/com.termux/files/usr')
         info['pkg_mgr'] = 'pkg'
-        info['packages'] = ['git', 'patch', 'make', 'clang', 'zlib', 'liblzma', 'xz-utils', 'lzo', 'lzo2', 'binutils', 'wget', 'curl']
+        info['packages'] = ['git', 'patch', 'make', 'clang', 'zlib', 'liblzma', 'xz-utils', 'lzo', 'lzo2', 'binutils', 'curl']
     # Check for Debian/Ubuntu
     elif shutil.which('apt'):
         info['pkg_mgr'] = 'apt'
         info['prefix'] = '/usr'
         # FIX: Added python3 to Debian/Ubuntu packages
-        info['packages'] = ['python3', 'git', 'patch', 'make', 'gcc', 'g++', 'zlib1g-dev', 'liblzma-dev', 'liblzo2-dev', 'binutils', 'wget', 'curl']
+        info['packages'] = ['python3', 'git', 'patch', 'make', 'gcc', 'g++', 'zlib1g-dev', 'liblzma-dev', 'liblzo2-dev', 'binutils', 'curl']
     # Check for Arch Linux
     elif shutil.which('pacman'):
         info['pkg_mgr'] = 'pacman'
         info['prefix'] = '/usr'
-        info['packages'] = ['git', 'patch', 'make', 'gcc', 'zlib', 'xz', 'lzo', 'binutils', 'wget', 'curl']
+        info['packages'] = ['git', 'patch', 'make', 'gcc', 'zlib', 'xz', 'lzo', 'binutils', 'curl']
     # Check for Fedora/RHEL
     elif shutil.which('dnf'):
         info['pkg_mgr'] = 'dnf'
         info['prefix'] = '/usr'
-        info['packages'] = ['git', 'patch', 'make', 'gcc', 'gcc-c++', 'zlib-devel', 'xz-devel', 'lzo-devel', 'binutils', 'wget', 'curl']
+        info['packages'] = ['git', 'patch', 'make', 'gcc', 'gcc-c++', 'zlib-devel', 'xz-devel', 'lzo-devel', 'binutils', 'curl']
     # Check for Alpine
     elif shutil.which('apk'):
         info['pkg_mgr'] = 'apk'
         info['prefix'] = '/usr'
-        info['packages'] = ['git', 'patch', 'make', 'gcc', 'g++', 'musl-dev', 'zlib-dev', 'xz-dev', 'lzo-dev', 'binutils', 'wget', 'curl']
+        info['packages'] = ['git', 'patch', 'make', 'gcc', 'g++', 'musl-dev', 'zlib-dev', 'xz-dev', 'lzo-dev', 'binutils', 'curl']
 
     return info
 
+def apt_lists_fresh():
+    """Check whether apt package lists exist and were refreshed recently"""
+    try:
+        lists = [f for f in os.listdir(APT_LISTS_DIR) if f not in ('partial', 'lock')]
+        age = time.time() - os.stat(APT_LISTS_DIR).st_mtime
+    except OSError:
+        return False
+    return bool(lists) and age < APT_UPDATE_MAX_AGE
+
+def pkg_cache_opts(pkg_mgr):
+    """Return package manager options that keep downloads in PKG_CACHE_DIR"""
+    if not PKG_CACHE_DIR:
+        return []
+
+    cache_dir = os.path.abspath(PKG_CACHE_DIR)
+    try:
+        if pkg_mgr == 'apt':
+            # apt refuses to use an archive dir without a partial/ subdirectory
+            os.makedirs(os.path.join(cache_dir, 'partial'), exist_ok=True)
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        log(f"Could not create package cache {cache_dir}: {e}", Colors.WARN)
+        return []
+
+    if pkg_mgr == 'apt':
+        return ["-o", f"Dir::Cache::Archives={cache_dir}"]
+    if pkg_mgr == 'pacman':
+        return ["--cachedir", cache_dir]
+    if pkg_mgr == 'dnf':
+        return [f"--setopt=cachedir={cache_dir}", "--setopt=keepcache=True"]
+    if pkg_mgr == 'apk':
+        return ["--cache-dir", cache_dir]
+    return []
+
 def install_deps(env):
     """Install required dependencies based on detected package manager"""
     log(f"Installing dependencies for {env['pkg_mgr'] or 'Unknown OS'}...")
@@ -127,29 +225,50 @@ def install_deps(env):
 
     # Check if we're in a container (no sudo needed)
     in_container = os.path.exists('/.dockerenv') or os.environ.get('GITHUB_ACTIONS') == 'true'
-    sudo_prefix = "" if in_container else "sudo "
+    sudo_prefix = [] if in_container else ["sudo"]
 
     if in_container:
         vlog("Running in container - no sudo needed")
     else:
         vlog("Running on host system - using sudo")
 
+    cache_opts = pkg_cache_opts(env['pkg_mgr'])
+    if cache_opts:
+        vlog(f"Using package cache: {PKG_CACHE_DIR}")
+
     if env['pkg_mgr'] == 'pkg':
         # Termux
-        for pkg in env['packages']:
-            log(f"Installing {pkg}...")
-            run_cmd(f"pkg install -y {pkg}", silent=not VERBOSE, check=False)
+        vlog(f"Running pkg install for {len(env['packages'])} packages...")
+        result = run_cmd(["pkg", "install", "-y"] + env['packages'], silent=not VERBOSE, check=False)
+        if result and result.returncode == 0:
+            vlog("✓ pkg install succeeded", Colors.OK)
+        else:
+            # One unknown name aborts the whole apt transaction, so retry per
+            # package to install everything that does exist
+            log("✗ pkg install failed, installing packages one by one...", Colors.WARN)
+            for pkg in env['packages']:
+                log(f"Installing {pkg}...")
+                run_cmd(["pkg", "install", "-y", pkg], silent=not VERBOSE, check=False)
+
     elif env['pkg_mgr'] == 'apt':
         # Debian/Ubuntu
-        vlog("Running apt-get update...")
-        result = run_cmd(f"{sudo_prefix}apt-get update -y", silent=not VERBOSE, check=False)
-        if result and result.returncode == 0:
-            vlog("✓ apt-get update succeeded", Colors.OK)
+        if apt_lists_fresh():
+            vlog("Package lists are recent, skipping apt-get update")
         else:
-            vlog("✗ apt-get update failed", Colors.WARN)
-        
+            vlog("Running apt-get update...")
+            result = run_cmd(sudo_prefix + ["apt-get", "update", "-y"], silent=not VERBOSE, check=False)
+            if result and result.returncode == 0:
+                vlog("✓ apt-get update succeeded", Colors.OK)
+            else:
+                vlog("✗ apt-get update failed", Colors.WARN)
+
+        if cache_opts:
+            # Download into the persistent cache first; the install then only unpacks
+            vlog(f"Priming package cache in {PKG_CACHE_DIR}...")
+            run_cmd(sudo_prefix + ["apt-get", "install", "-y", "--download-only"] + cache_opts + env['packages'], silent=not VERBOSE, check=False)
+
         vlog(f"Running apt-get install for {len(env['packages'])} packages...")
-        result = run_cmd(f"{sudo_prefix}apt-get install -y {' '.join(env['packages'])}", silent=not VERBOSE, check=False)
+        result = run_cmd(sudo_prefix + ["apt-get", "install", "-y"] + cache_opts + env['packages'], silent=not VERBOSE, check=False)
         if result and result.returncode == 0:
             vlog("✓ apt-get install succeeded", Colors.OK)
         else:
@@ -158,7 +277,7 @@ def install_deps(env):
     elif env['pkg_mgr'] == 'pacman':
         # Arch Linux
         vlog(f"Running pacman install for {len(env['packages'])} packages...")
-        result = run_cmd(f"{sudo_prefix}pacman -S --noconfirm {' '.join(env['packages'])}", silent=not VERBOSE, check=False)
+        result = run_cmd(sudo_prefix + ["pacman", "-S", "--noconfirm"] + cache_opts + env['packages'], silent=not VERBOSE, check=False)
         if result and result.returncode == 0:
             vlog("✓ pacman install succeeded", Colors.OK)
         else:
@@ -167,7 +286,7 @@ def install_deps(env):
     elif env['pkg_mgr'] == 'dnf':
         # Fedora/RHEL
         vlog(f"Running dnf install for {len(env['packages'])} packages...")
-        result = run_cmd(f"{sudo_prefix}dnf install -y {' '.join(env['packages'])}", silent=not VERBOSE, check=False)
+        result = run_cmd(sudo_prefix + ["dnf", "install", "-y"] + cache_opts + env['packages'], silent=not VERBOSE, check=False)
         if result and result.returncode == 0:
             vlog("✓ dnf install succeeded", Colors.OK)
         else:
@@ -176,7 +295,7 @@ def install_deps(env):
     elif env['pkg_mgr'] == 'apk':
         # Alpine
         vlog(f"Running apk add for {len(env['packages'])} packages...")
-        result = run_cmd(f"{sudo_prefix}apk add --no-cache {' '.join(env['packages'])}", silent=not VERBOSE, check=False)
+        result = run_cmd(sudo_prefix + ["apk", "add"] + (cache_opts or ["--no-cache"]) + env['packages'], silent=not VERBOSE, check=False)
         if result and result.returncode == 0:
             vlog("✓ apk add succeeded", Colors.OK)
         else:
@@ -184,58 +303,196 @@ def install_deps(env):
 
     log("✓ Dependencies installation step completed", Colors.OK)
 
-def setup_source():
-    """Download and extract source code"""
-    log("Setting up build directory...")
-
-    if os.path.exists(BUILD_DIR):
-        vlog(f"Removing existing build directory: {BUILD_DIR}")
-        shutil.rmtree(BUILD_DIR)
-    os.makedirs(BUILD_DIR)
-    vlog(f"Created build directory: {BUILD_DIR}")
-    os.chdir(BUILD_DIR)
-    vlog(f"Changed to directory: {os.getcwd()}")
+def discard_dir(path):
+    """Move a directory out of the way and delete it in a background thread
 
-    # Configure git for HTTPS (disable SSL verification as fallback)
-    vlog("Configuring git for HTTPS...")
-    run_cmd("git config --global http.sslVerify false", silent=True, check=False)
+    The rename is all the caller waits for. If the process exits before the
+    thread finishes, sweep_stale_dirs() removes the leftover on the next run.
+    """
+    stale = os.path.abspath(f"{path}.stale.{os.getpid()}.{time.monotonic_ns()}")
+    os.rename(path, stale)
+    threading.Thread(target=shutil.rmtree, args=(stale, True), daemon=True).start()
+
+def sweep_stale_dirs():
+    """Delete directories left behind by interrupted background cleanups"""
+    patterns = [
+        f"{BUILD_DIR}.stale.*",
+        os.path.join(BUILD_DIR, "*.stale.*"),
+        # Extractions interrupted before they could be verified
+        os.path.join(BUILD_DIR, "*.partial.*"),
+    ]
+    for pattern in patterns:
+        for stale in glob.glob(pattern):
+            vlog(f"Removing stale directory in background: {stale}")
+            threading.Thread(target=shutil.rmtree, args=(os.path.abspath(stale), True), daemon=True).start()
+
+def update_repo():
+    """Fast-forward an existing shallow clone to the latest upstream commit"""
+    log("Updating existing Sasquatch repository...")
+    result = run_cmd(["git", "-C", "repo"] + GIT_PARALLEL_OPTS + ["fetch", f"--jobs={GIT_JOBS}", "--depth=1", "origin"], silent=not VERBOSE, check=False)
+    if result and result.returncode == 0:
+        result = run_cmd(["git", "-C", "repo", "reset", "--hard", "origin/HEAD"], silent=not VERBOSE, check=False)
+    return bool(result and result.returncode == 0)
+
+def clone_repo():
+    """Clone the Sasquatch repository (HTTPS with HTTP fallback)"""
+    if os.path.isdir("repo/.git"):
+        if update_repo():
+            log("✓ Repository up to date", Colors.OK)
+            return True
+        if os.path.isfile(PATCH_FILE):
+            # e.g. offline: the checkout we already have is good enough
+            log("✗ Could not update existing repository, using current checkout", Colors.WARN)
+            return True
+        log("✗ Existing repository is unusable, cloning again...", Colors.WARN)
+    if os.path.exists("repo"):
+        discard_dir("repo")
 
     log("Cloning Sasquatch repository...")
     vlog(f"Repository URL: {REPO_URL}")
-    result = run_cmd(f"git clone {REPO_URL} repo", silent=not VERBOSE, check=False)
+    result = run_cmd(["git"] + GIT_PARALLEL_OPTS + ["clone"] + GIT_CLONE_OPTS + [REPO_URL, "repo"], silent=not VERBOSE, check=False)
     if not result or result.returncode != 0:
         log("✗ Git clone with HTTPS failed, trying HTTP...", Colors.WARN)
         http_url = REPO_URL.replace("https://", "http://")
         vlog(f"Trying HTTP URL: {http_url}")
-        result = run_cmd(f"git clone {http_url} repo", silent=not VERBOSE, check=False)
+        result = run_cmd(["git"] + GIT_PARALLEL_OPTS + ["clone"] + GIT_CLONE_OPTS + [http_url, "repo"], silent=not VERBOSE, check=False)
         if not result or result.returncode != 0:
             log("✗ Error cloning repository", Colors.FAIL)
             if result and result.stderr:
-                log(f"Error details: {result.stderr}", Colors.FAIL)
+                log(f"Error details: {result.stderr.decode(errors='replace')}", Colors.FAIL)
             return False
+
+    # Materialize only patches/ in the working tree
+    vlog("Restricting checkout to patches/...")
+    result = run_cmd(["git", "-C", "repo", "sparse-checkout", "set", "patches"], silent=not VERBOSE, check=False)
+    if not result or result.returncode != 0:
+        vlog("✗ sparse-checkout failed, checking out full tree", Colors.WARN)
+        run_cmd(["git", "-C", "repo", "sparse-checkout", "disable"], silent=not VERBOSE, check=False)
     log("✓ Repository cloned successfully", Colors.OK)
+    return True
+
+class HashingReader:
+    """File-like wrapper that computes the SHA-256 of everything read through it"""
 
-    log("Downloading SquashFS 4.3...")
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+def safe_members(tar):
+    """Yield tar members, refusing anything that could escape the destination
+
+    Fallback for Pythons whose tarfile has no 'data' extraction filter.
+    """
+    for member in tar:
+        names = [member.name]
+        if member.issym() or member.islnk():
+            names.append(member.linkname)
+        for name in names:
+            if os.path.isabs(name) or '..' in name.replace('\\', '/').split('/'):
+                raise tarfile.TarError(f"Unsafe path in archive: {name}")
+        if member.isdev():
+            raise tarfile.TarError(f"Device file in archive: {member.name}")
+        yield member
+
+def stream_extract(url, dest, context=None):
+    """Extract a .tar.gz into dest while it downloads and return its SHA-256 hex digest"""
+    with urllib.request.urlopen(url, context=context, timeout=DOWNLOAD_TIMEOUT) as resp:
+        reader = HashingReader(resp)
+        # 'r|gz' never seeks, so the HTTP response can be read directly
+        with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+            if hasattr(tarfile, 'data_filter'):
+                tar.extractall(dest, filter='data')
+            else:
+                tar.extractall(dest, members=safe_members(tar))
+        # Hash any trailing bytes tarfile did not need
+        while reader.read(65536):
+            pass
+    return reader.sha256.hexdigest()
+
+def fetch_squashfs():
+    """Download and extract the SquashFS 4.3 tarball"""
+    if os.path.isfile(SQUASHFS_MARKER):
+        log("✓ SquashFS 4.3 already extracted, skipping download", Colors.OK)
+        return True
+    if os.path.exists("squashfs4.3"):
+        # Unverified tree (interrupted run or older builder version)
+        discard_dir("squashfs4.3")
+
+    log("Downloading and extracting SquashFS 4.3...")
     vlog(f"Download URL: {SQUASHFS_URL}")
-    result = run_cmd(f"wget --no-check-certificate {SQUASHFS_URL}", check=False, silent=not VERBOSE)
-    if not result or result.returncode != 0:
-        log("✗ wget failed, trying curl as fallback...", Colors.WARN)
-        result = run_cmd(f"curl -k -L -o squashfs4.3.tar.gz {SQUASHFS_URL}", check=False, silent=not VERBOSE)
-        if not result or result.returncode != 0:
-            log("✗ Error: Could not download SquashFS 4.3 with wget or curl", Colors.FAIL)
-            if result and result.stderr:
-                log(f"Error details: {result.stderr}", Colors.FAIL)
+
+    # Extract next to the final location and only move the tree into place
+    # once the checksum matches, so a failed run never leaves it half-written.
+    # PIDs repeat across container runs, so the name must not rely on them alone
+    staging = f"squashfs4.3.partial.{os.getpid()}.{time.monotonic_ns()}"
+    try:
+        os.makedirs(staging)
+        try:
+            digest = stream_extract(SQUASHFS_URL, staging)
+        except urllib.error.URLError as e:
+            if not isinstance(e.reason, ssl.SSLError):
+                raise
+            log("✗ SSL verification failed, retrying without certificate check...", Colors.WARN)
+            discard_dir(staging)
+            os.makedirs(staging)
+            digest = stream_extract(SQUASHFS_URL, staging, ssl._create_unverified_context())
+
+        vlog(f"SHA-256: {digest}")
+        if digest != SQUASHFS_SHA256:
+            log("✗ Error: SquashFS 4.3 checksum mismatch", Colors.FAIL)
+            log(f"Expected {SQUASHFS_SHA256}, got {digest}", Colors.FAIL)
             return False
-    log("✓ SquashFS 4.3 downloaded successfully", Colors.OK)
 
-    log("Extracting archive...")
-    result = run_cmd("tar -zxvf squashfs4.3.tar.gz", check=False, silent=not VERBOSE)
-    if not result or result.returncode != 0:
-        log("✗ Error extracting archive", Colors.FAIL)
-        if result and result.stderr:
-            log(f"Error details: {result.stderr}", Colors.FAIL)
+        extracted = os.path.join(staging, "squashfs4.3")
+        if not os.path.isdir(extracted):
+            log("✗ Error: squashfs4.3 directory not found in archive", Colors.FAIL)
+            return False
+        with open(os.path.join(extracted, os.path.basename(SQUASHFS_MARKER)), 'w') as f:
+            f.write(digest + '\n')
+        os.rename(extracted, "squashfs4.3")
+    except (OSError, EOFError, zlib.error, tarfile.TarError) as e:
+        log("✗ Error: Could not download and extract SquashFS 4.3", Colors.FAIL)
+        log(f"Error details: {e}", Colors.FAIL)
+        return False
+    finally:
+        # Whatever is left here is unverified or already moved out
+        if os.path.exists(staging):
+            discard_dir(staging)
+
+    log("✓ SquashFS 4.3 downloaded and extracted successfully", Colors.OK)
+    return True
+
+def setup_source():
+    """Download and extract source code"""
+    log("Setting up build directory...")
+    sweep_stale_dirs()
+
+    if CLEAN_BUILD and os.path.exists(BUILD_DIR):
+        vlog(f"Removing existing build directory: {BUILD_DIR}")
+        discard_dir(BUILD_DIR)
+    elif os.path.exists(BUILD_DIR):
+        vlog(f"Reusing existing build directory: {BUILD_DIR}")
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    os.chdir(BUILD_DIR)
+    vlog(f"Changed to directory: {os.getcwd()}")
+
+    # Configure git for HTTPS (disable SSL verification as fallback)
+    vlog("Configuring git for HTTPS...")
+    run_cmd(["git", "config", "--global", "http.sslVerify", "false"], silent=True, check=False)
+
+    # The clone (github.com) and the tarball download (sourceforge.net) are
+    # independent, so run them side by side and join before going further.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        tasks = [pool.submit(clone_repo), pool.submit(fetch_squashfs)]
+        results = [task.result() for task in tasks]
+
+    if not all(results):
         return False
-    log("✓ Archive extracted successfully", Colors.OK)
 
     if not os.path.exists("squashfs4.3"):
         log("✗ Error: squashfs4.3 directory not found after extraction", Colors.FAIL)
@@ -250,17 +507,35 @@ def apply_patches():
     log("Applying Sasquatch patches...")
     os.chdir("squashfs4.3")
 
+    # A reused tree has already been patched; patching twice would corrupt it
+    if os.path.exists(PATCHED_MARKER):
+        log("✓ Patches already applied", Colors.OK)
+        return
+
     # Apply the original patch from the repo
-    patch_file = "../repo/patches/patch0.txt"
+    patch_file = os.path.join("..", PATCH_FILE)
     if os.path.exists(patch_file):
-        # Convert patch file encoding if needed
-        with open(patch_file, 'r', encoding='latin-1') as f:
-            patch_content = f.read().replace('\r\n', '\n')
-        with open("sasquatch.patch", 'w', encoding='utf-8') as f:
-            f.write(patch_content)
-
-        run_cmd("patch -p0 -f -i sasquatch.patch", check=False)
-        log("✓ Patches applied", Colors.OK)
+        # Normalize CRLF line endings, streaming bytes so nothing is transcoded
+        with open(patch_file, 'rb') as fi, open("sasquatch.patch", 'wb') as fo:
+            carry = b''
+            for chunk in iter(lambda: fi.read(65536), b''):
+                chunk = carry + chunk
+                # Hold back a trailing CR in case its LF starts the next chunk
+                carry = b'\r' if chunk.endswith(b'\r') else b''
+                fo.write(chunk[:len(chunk) - len(carry)].replace(b'\r\n', b'\n'))
+            fo.write(carry)
+
+        result = run_cmd(["patch", "-p0", "-f", "-i", "sasquatch.patch"], check=False)
+        if result and result.returncode == 0:
+            with open(PATCHED_MARKER, 'w') as f:
+                f.write(patch_file + '\n')
+            log("✓ Patches applied", Colors.OK)
+        else:
+            log("✗ Patch did not apply cleanly, continuing anyway", Colors.WARN)
+            # The tree may be half-patched: have the next run extract a fresh one
+            verified_marker = os.path.basename(SQUASHFS_MARKER)
+            if os.path.exists(verified_marker):
+                os.remove(verified_marker)
     else:
         log("Warning: Patch file not found, continuing without patches", Colors.WARN)
 
@@ -284,11 +559,37 @@ def create_compat_header():
 #endif
 #endif
 """
-    os.makedirs("squashfs-tools", exist_ok=True)
-    with open("squashfs-tools/compat.h", "w") as f:
-        f.write(content)
+    path = "squashfs-tools/compat.h"
+    # Four sources include it: keep its mtime so make does not rebuild them
+    if os.path.exists(path):
+        if not rewrite_if_changed(path, lambda _: content.encode()):
+            vlog("compat.h is up to date")
+            return
+    else:
+        os.makedirs("squashfs-tools", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
     log("✓ compat.h created", Colors.OK)
 
+def rewrite_if_changed(path, fn):
+    """Rewrite a file with fn(content) only if that changes it
+
+    fn receives and returns bytes. Unchanged files keep their mtime, and the
+    new content is renamed into place so a crash never leaves a half-written
+    file. Returns True if the file was rewritten.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    new_data = fn(data)
+    if new_data == data:
+        return False
+
+    tmp = path + ".tmp"
+    with open(tmp, 'wb') as f:
+        f.write(new_data)
+    os.replace(tmp, path)
+    return True
+
 def fix_error_header():
     """Fix the duplicate symbol 'verbose' error"""
     log("Fixing duplicate symbol 'verbose'...")
@@ -297,45 +598,39 @@ def fix_error_header():
     error_h = os.path.join(tools_path, "error.h")
 
     if os.path.exists(error_h):
-        with open(error_h, 'r') as f:
-            content = f.read()
-
         # Change definition to declaration
-        content = re.sub(
-            r'^\s*int\s+verbose\s*(=\s*0)?\s*;',
-            'extern int verbose;',
-            content,
-            flags=re.MULTILINE
-        )
-
-        with open(error_h, 'w') as f:
-            f.write(content)
-
-        log("✓ Fixed error.h", Colors.OK)
+        if rewrite_if_changed(error_h, lambda data: _VERBOSE_DECL_RE.sub(b'extern int verbose;', data)):
+            log("✓ Fixed error.h", Colors.OK)
+        else:
+            vlog("error.h already fixed")
 
     # Add definition to unsquashfs.c
+    def add_definition(content):
+        if b'int verbose = 0;' in content:
+            return content
+
+        # Splice the definition in right after the last #include line
+        last_include = None
+        for last_include in _INCLUDE_LINE_RE.finditer(content):
+            pass
+        if last_include is None:
+            return content
+
+        off = last_include.end()
+        definition = b'\n/* Global verbose variable definition */\nint verbose = 0;\n'
+        if last_include.group().endswith(b'\n'):
+            definition += b'\n'
+        else:
+            # The #include is the final line and has no newline of its own
+            definition = b'\n' + definition
+        return content[:off] + definition + content[off:]
+
     unsquashfs_c = os.path.join(tools_path, "unsquashfs.c")
     if os.path.exists(unsquashfs_c):
-        with open(unsquashfs_c, 'r') as f:
-            content = f.read()
-
-        if 'int verbose = 0;' not in content:
-            lines = content.split('\n')
-            last_include = -1
-            for i, line in enumerate(lines):
-                if line.strip().startswith('#include'):
-                    last_include = i
-
-            if last_include >= 0:
-                lines.insert(last_include + 1, '')
-                lines.insert(last_include + 2, '/* Global verbose variable definition */')
-                lines.insert(last_include + 3, 'int verbose = 0;')
-                lines.insert(last_include + 4, '')
-
-                with open(unsquashfs_c, 'w') as f:
-                    f.write('\n'.join(lines))
-
-                log("✓ Fixed unsquashfs.c", Colors.OK)
+        if rewrite_if_changed(unsquashfs_c, add_definition):
+            log("✓ Fixed unsquashfs.c", Colors.OK)
+        else:
+            vlog("unsquashfs.c already defines verbose")
 
 def fix_lzo_wrapper():
     """FIX #2: Fix LZO header includes - handle different include path conventions
@@ -348,32 +643,31 @@ def fix_lzo_wrapper():
     tools_path = "squashfs-tools"
     lzo_wrapper = os.path.join(tools_path, "lzo_wrapper.c")
     
-    if os.path.exists(lzo_wrapper):
-        with open(lzo_wrapper, 'r') as f:
-            content = f.read()
-        
+    def add_fallback_include(content):
         # Check if lzo headers are being included at all
-        if '#include' in content and 'lzo' in content:
+        if b'#include' in content and b'lzo' in content:
             # Try to make includes more robust
             # Some Alpine/Arch systems might need different paths
             # We'll add fallback includes if needed
-            
-            if '#include <lzo/lzoconf.h>' in content:
+
+            if b'#include <lzo/lzoconf.h>' in content and b'#ifndef LZO_E_OK' not in content:
                 # Add a compatibility header check
-                compat_check = '#include <lzo/lzoconf.h>\n'
-                compat_check += '#ifndef LZO_E_OK\n'
-                compat_check += '  #include <lzo.h>\n'
-                compat_check += '#endif\n'
-                
+                compat_check = b'#include <lzo/lzoconf.h>\n'
+                compat_check += b'#ifndef LZO_E_OK\n'
+                compat_check += b'  #include <lzo.h>\n'
+                compat_check += b'#endif\n'
+
                 content = content.replace(
-                    '#include <lzo/lzoconf.h>',
+                    b'#include <lzo/lzoconf.h>',
                     compat_check
                 )
-            
-            with open(lzo_wrapper, 'w') as f:
-                f.write(content)
-            
+        return content
+
+    if os.path.exists(lzo_wrapper):
+        if rewrite_if_changed(lzo_wrapper, add_fallback_include):
             log("✓ Fixed LZO wrapper includes", Colors.OK)
+        else:
+            vlog("LZO wrapper includes already fixed")
 
 def fix_signal_handlers():
     """FIX #1: Fix signal handler signatures to accept int parameter
@@ -390,28 +684,19 @@ def fix_signal_handlers():
     tools_path = "squashfs-tools"
     unsquashfs_c = os.path.join(tools_path, "unsquashfs.c")
     
-    if os.path.exists(unsquashfs_c):
-        with open(unsquashfs_c, 'r') as f:
-            content = f.read()
-        
+    def fix_signatures(content):
         # Fix sigwinch_handler signature: void sigwinch_handler() -> void sigwinch_handler(int sig)
-        content = re.sub(
-            r'void\s+sigwinch_handler\s*\(\s*\)',
-            'void sigwinch_handler(int sig)',
-            content
-        )
-        
+        content = _SIGWINCH_HANDLER_RE.sub(b'void sigwinch_handler(int sig)', content)
+
         # Fix sigalrm_handler signature: void sigalrm_handler() -> void sigalrm_handler(int sig)
-        content = re.sub(
-            r'void\s+sigalrm_handler\s*\(\s*\)',
-            'void sigalrm_handler(int sig)',
-            content
-        )
-        
-        with open(unsquashfs_c, 'w') as f:
-            f.write(content)
-        
-        log("✓ Fixed signal handler signatures", Colors.OK)
+        content = _SIGALRM_HANDLER_RE.sub(b'void sigalrm_handler(int sig)', content)
+        return content
+
+    if os.path.exists(unsquashfs_c):
+        if rewrite_if_changed(unsquashfs_c, fix_signatures):
+            log("✓ Fixed signal handler signatures", Colors.OK)
+        else:
+            vlog("Signal handler signatures already fixed")
 
 def fix_fnm_extmatch():
     """Fix FNM_EXTMATCH compatibility (legacy, now handled in compat.h)"""
@@ -420,20 +705,27 @@ def fix_fnm_extmatch():
     tools_path = "squashfs-tools"
     unsquashfs_c = os.path.join(tools_path, "unsquashfs.c")
 
-    if os.path.exists(unsquashfs_c):
-        with open(unsquashfs_c, 'r') as f:
-            content = f.read()
-
+    def add_guard(content):
         # Only add if compat.h is not already included
-        if '#include "compat.h"' not in content:
-            fnm_fix = "#ifndef FNM_EXTMATCH\n#define FNM_EXTMATCH 0\n#endif\n\n"
-            if not content.startswith("#ifndef FNM_EXTMATCH"):
+        if b'#include "compat.h"' not in content:
+            fnm_fix = b"#ifndef FNM_EXTMATCH\n#define FNM_EXTMATCH 0\n#endif\n\n"
+            if not content.startswith(b"#ifndef FNM_EXTMATCH"):
                 content = fnm_fix + content
+        return content
 
-            with open(unsquashfs_c, 'w') as f:
-                f.write(content)
-
+    if os.path.exists(unsquashfs_c):
+        # Cheap check first: the guard is prepended and compat.h goes in after
+        # the first system include, so either shows up in the licence-sized head
+        with open(unsquashfs_c, 'rb') as f:
+            head = f.read(8192)
+        if head.startswith(b"#ifndef FNM_EXTMATCH") or b'#include "compat.h"' in head:
+            vlog("FNM_EXTMATCH needs no fix")
+            return
+
+        if rewrite_if_changed(unsquashfs_c, add_guard):
             log("✓ Fixed FNM_EXTMATCH", Colors.OK)
+        else:
+            vlog("FNM_EXTMATCH needs no fix")
 
 def disable_xz_wrapper():
     """Disable XZ wrapper to avoid conflicts"""
@@ -447,9 +739,22 @@ def disable_xz_wrapper():
 
     for xz_file in xz_files:
         if os.path.exists(xz_file):
-            with open(xz_file, 'w') as f:
-                f.write('/* XZ support disabled */\n')
-            log(f"✓ Disabled {os.path.basename(xz_file)}", Colors.OK)
+            if rewrite_if_changed(xz_file, lambda content: b'/* XZ support disabled */\n'):
+                log(f"✓ Disabled {os.path.basename(xz_file)}", Colors.OK)
+            else:
+                vlog(f"{os.path.basename(xz_file)} already disabled")
+
+def optimization_flags(env):
+    """Return the optimization CFLAGS for the sasquatch binary"""
+    if PORTABLE:
+        return "-O2"
+
+    # Tune for the host CPU and let the linker inline across files. clang on
+    # Android/AArch64 takes -mcpu=native rather than -march=native.
+    machine = platform.machine().lower()
+    if env['is_termux'] and machine.startswith(('arm', 'aarch64')):
+        return "-O2 -mcpu=native -flto"
+    return "-O2 -march=native -flto"
 
 def fix_makefile(env):
     """Fix Makefile for modern compilers"""
@@ -458,78 +763,95 @@ def fix_makefile(env):
     tools_path = "squashfs-tools"
     makefile = os.path.join(tools_path, "Makefile")
     prefix = env['prefix']
+    opt_flags = optimization_flags(env)
+    vlog(f"Optimization flags: {opt_flags}")
 
     if not os.path.exists(makefile):
         log("Error: Makefile not found!", Colors.FAIL)
         return
 
-    with open(makefile, 'r') as f:
-        content = f.read()
-
-    # Remove -Werror
-    content = content.replace("-Werror", "")
-
-    lines = content.split('\n')
-
-    # Fix CFLAGS
-    for i, line in enumerate(lines):
-        if line.startswith("CFLAGS") and './LZMA' in line:
-            lines[i] = f"CFLAGS := -g -O2 -I{prefix}/include -I. -I./LZMA/lzma465/C -I./LZMA/lzmalt -I./LZMA/lzmadaptive/C/7zip/Compress/LZMA_Lib"
-
-    # Fix LIBS - ADD liblzmalib.a
-    for i, line in enumerate(lines):
-        if line.startswith("LIBS +=") and '-llzma' in line:
-            lines[i] = f"LIBS += -lz -lm -L{prefix}/lib -llzo2 -llzma -L./LZMA/lzmadaptive/C/7zip/Compress/LZMA_Lib -llzmalib"
-
-    # Remove XZ_SUPPORT
-    for i, line in enumerate(lines):
-        if '-DXZ_SUPPORT' in line:
-            lines[i] = line.replace('-DXZ_SUPPORT', '')
-
-    content = '\n'.join(lines)
-
-    with open(makefile, 'w') as f:
-        f.write(content)
+    def rewrite(data):
+        content = data.decode('latin-1')
+
+        # Remove -Werror
+        content = content.replace("-Werror", "")
+
+        # Rewrite CFLAGS/LIBS and strip XZ_SUPPORT in a single pass over the lines
+        lines = []
+        for line in content.split('\n'):
+            if line == LTO_LDFLAGS:
+                # Added by a previous run; re-added below unless --portable
+                continue
+            if line.startswith("CFLAGS") and './LZMA' in line:
+                # Fix CFLAGS
+                line = f"CFLAGS := -g {opt_flags} -pipe -I{prefix}/include -I. -I./LZMA/lzma465/C -I./LZMA/lzmalt -I./LZMA/lzmadaptive/C/7zip/Compress/LZMA_Lib"
+                if '-flto' in opt_flags:
+                    # LTO must also be enabled at link time
+                    line += '\n' + LTO_LDFLAGS
+            elif line.startswith("LIBS +=") and '-llzma' in line:
+                # Fix LIBS - ADD liblzmalib.a
+                line = f"LIBS += -lz -lm -L{prefix}/lib -llzo2 -llzma -L./LZMA/lzmadaptive/C/7zip/Compress/LZMA_Lib -llzmalib"
+            elif '-DXZ_SUPPORT' in line:
+                # Remove XZ_SUPPORT
+                line = line.replace('-DXZ_SUPPORT', '')
+            lines.append(line)
+
+        return '\n'.join(lines).encode('latin-1')
+
+    if rewrite_if_changed(makefile, rewrite):
+        log("✓ Makefile fixed", Colors.OK)
+    else:
+        vlog("Makefile already fixed")
 
-    log("✓ Makefile fixed", Colors.OK)
+def inject_compat_header():
+    """Include compat.h in the sources that need the musl/Alpine fallbacks"""
+    def inject_compat(data):
+        if b'#include "compat.h"' in data:
+            return data
+        return _FIRST_SYS_INCLUDE_RE.sub(rb'\1#include "compat.h"\n', data, count=1)
 
-def apply_universal_fixes(env):
-    """Apply all necessary fixes for modern compilation"""
-    log("Applying universal fixes for modern compilers...")
-
-    # Create compat.h for musl/Alpine support
-    create_compat_header()
-
-    # Inject compat.h into source files
     for c_file in ["mksquashfs.c", "unsquashfs.c", "pseudo.c", "action.c"]:
         path = os.path.join("squashfs-tools", c_file)
         if os.path.exists(path):
-            with open(path, "r") as f:
-                data = f.read()
             # Insert after the first include
-            if '#include "compat.h"' not in data:
-                data = re.sub(r'(#include <.*>\n)', r'\1#include "compat.h"\n', data, count=1)
-                with open(path, "w") as f:
-                    f.write(data)
+            if rewrite_if_changed(path, inject_compat):
                 log(f"✓ Injected compat.h into {c_file}", Colors.OK)
 
+def fix_unsquashfs_sources():
+    """Run every fixer that edits unsquashfs.c, in order"""
+    # Inject compat.h into source files
+    inject_compat_header()
+
     # Fix verbose duplicate
     fix_error_header()
 
-    # FIX #2: Fix LZO wrapper includes (NEW)
-    fix_lzo_wrapper()
-
     # FIX #1: Fix signal handlers (NEW)
     fix_signal_handlers()
 
-    # Fix FNM_EXTMATCH (legacy fallback)
+    # Fix FNM_EXTMATCH (legacy fallback, checks for the compat.h include)
     fix_fnm_extmatch()
 
-    # Disable XZ wrapper
-    disable_xz_wrapper()
+def apply_universal_fixes(env):
+    """Apply all necessary fixes for modern compilation"""
+    log("Applying universal fixes for modern compilers...")
 
-    # Fix Makefile
-    fix_makefile(env)
+    # Create compat.h for musl/Alpine support
+    create_compat_header()
+
+    # The remaining fixers touch disjoint files, so run them side by side.
+    # Everything that edits unsquashfs.c is serialized in a single task.
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        tasks = [
+            pool.submit(fix_unsquashfs_sources),
+            # FIX #2: Fix LZO wrapper includes (NEW)
+            pool.submit(fix_lzo_wrapper),
+            # Disable XZ wrapper
+            pool.submit(disable_xz_wrapper),
+            # Fix Makefile
+            pool.submit(fix_makefile, env),
+        ]
+        for task in tasks:
+            task.result()
 
     log("✓ All fixes applied", Colors.OK)
 
@@ -540,22 +862,56 @@ def build_and_deploy(env):
     tools_path = "squashfs-tools"
     os.chdir(tools_path)
 
-    # Clean build
-    run_cmd("make clean", check=False, silent=True)
-
-    # Build with parallel jobs
+    # Build with parallel jobs, capped by load average. Termux phones often
+    # have many cores but little RAM, so only use half of them by default.
     nproc = os.cpu_count() or 2
-    log(f"Building with {nproc} parallel jobs...")
+    jobs = max(1, nproc // 2) if env['is_termux'] else nproc
+    if MAKE_JOBS:
+        try:
+            jobs = max(1, int(MAKE_JOBS))
+        except ValueError:
+            log(f"Ignoring invalid SASQUATCH_JOBS={MAKE_JOBS!r}", Colors.WARN)
+    make_flags = [f"-j{jobs}", f"-l{jobs}"]
+    log(f"Building with {jobs} parallel jobs...")
 
     build_env = os.environ.copy()
+    # Recursive $(MAKE) calls inherit the same limits
+    build_env["MAKEFLAGS"] = " ".join(make_flags)
     if env['is_termux']:
         build_env["CC"] = "clang"
         build_env["CXX"] = "clang++"
 
+    # Reuse object files from previous builds when ccache is installed
+    if shutil.which('ccache') and not build_env.get("CC", "").startswith("ccache"):
+        build_env["CC"] = "ccache " + build_env.get("CC", "cc")
+        build_env["CXX"] = "ccache " + build_env.get("CXX", "c++")
+        build_env.setdefault("CCACHE_DIR", CCACHE_DIR)
+        vlog(f"Using ccache ({build_env['CCACHE_DIR']})")
+
     # Use -fcommon for modern GCC versions (fixes multiple definition errors)
     build_env["CFLAGS"] = build_env.get("CFLAGS", "") + " -fcommon"
 
-    result = run_cmd(f"make -j{nproc}", check=False)
+    # The Makefile does not track its own flags, so objects from a previous
+    # run are only reused when the compiler, flags and Makefile are unchanged
+    with open("Makefile", 'rb') as f:
+        config = hashlib.sha256(f.read())
+    for var in ("CC", "CFLAGS", "LDFLAGS"):
+        config.update(f"\0{var}={build_env.get(var, '')}".encode())
+    config = config.hexdigest()
+    try:
+        with open(BUILD_CONFIG_STAMP) as f:
+            previous = f.read().strip()
+    except OSError:
+        previous = None
+    if CLEAN_BUILD or config != previous:
+        vlog("Build configuration changed, running make clean")
+        run_cmd(["make", "clean"], check=False, silent=True)
+        with open(BUILD_CONFIG_STAMP, 'w') as f:
+            f.write(config + '\n')
+    else:
+        vlog("Build configuration unchanged, reusing object files")
+
+    result = run_cmd(["make"] + make_flags, check=False, env=build_env)
 
     if result and result.returncode == 0 and os.path.exists("sasquatch"):
         log("✓ BUILD SUCCESSFUL! 🎉", Colors.OK)
@@ -593,14 +949,16 @@ def build_and_deploy(env):
         log("✗ BUILD FAILED", Colors.FAIL)
         log("", Colors.INFO)
         log("Troubleshooting tips:", Colors.WARN)
-        log("1. Clean build: rm -rf " + BUILD_DIR, Colors.WARN)
+        log("1. Clean build: re-run with --clean", Colors.WARN)
         log("2. Check dependencies are installed", Colors.WARN)
         log("3. Try running script again", Colors.WARN)
+        if not PORTABLE:
+            log("4. Build without host-specific optimizations: re-run with --portable", Colors.WARN)
         return False
 
 def main():
     """Main execution flow"""
-    global VERBOSE
+    global VERBOSE, CLEAN_BUILD, PORTABLE
     
     # Parse command line arguments
     parser = argparse.ArgumentParser(
@@ -609,9 +967,15 @@ def main():
     )
     parser.add_argument('--verbose', '-v', action='store_true', 
                         help='Enable verbose output')
+    parser.add_argument('--clean', action='store_true',
+                        help=f'Delete {BUILD_DIR} and start from scratch instead of reusing it')
+    parser.add_argument('--portable', action='store_true',
+                        help='Build with plain -O2 (no -march=native/-flto) so the binary runs on other CPUs')
     args = parser.parse_args()
     
     VERBOSE = args.verbose
+    CLEAN_BUILD = args.clean
+    PORTABLE = args.portable
     
     if VERBOSE:
         vlog("Verbose mode enabled")
@@ -625,20 +989,25 @@ def main():
 
         # Install dependencies
         install_deps(env)
+        sys.stdout.flush()
 
         # Setup source code
         if not setup_source():
             log("Failed to setup source code", Colors.FAIL)
             sys.exit(1)
+        sys.stdout.flush()
 
         # Apply original patches
         apply_patches()
+        sys.stdout.flush()
 
         # Apply modern compiler fixes
         apply_universal_fixes(env)
+        sys.stdout.flush()
 
         # Build and deploy
         success = build_and_deploy(env)
+        sys.stdout.flush()
 
         if success:
             sys.exit(0)
@@ -650,6 +1019,7 @@ def main():
         sys.exit(130)
     except Exception as e:
         log(f"Unexpected error: {str(e)}", Colors.FAIL)
+        sys.stdout.flush()
         import traceback
         traceback.print_exc()
         sys.exit(1)